@@ -1,197 +1,633 @@
 import os
+import sys
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-import base64
-import requests
-import time
+try:
+    import pybase64 as base64  # SIMD base64 (same b64encode/b64decode API); optional
+except ImportError:
+    import base64
+import httpx
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
 import py_near
 from py_near.account import Account
+from py_near.exceptions.exceptions import RpcNotAvailableError, RpcEmptyResponse
+from py_near.exceptions.provider import RPCTimeoutError
 import asyncio
 import json
 import hashlib
+from loguru import logger
+import random
 import re
+import time
+import functools
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
 
 # Load .env variables
 load_dotenv()
 
-mcp = FastMCP(name="nova-mcp")
+# Loguru defaults to DEBUG on stderr; configured at import so `fastmcp run server.py:mcp` and hosted deployments
+# get it too. Per-call debug lines are skipped before formatting unless LOG_LEVEL=DEBUG.
+logger.remove()
+logger.add(sys.stderr, level=os.environ.get("LOG_LEVEL", "INFO"))
+
+@asynccontextmanager
+async def _lifespan(server):
+    """Closes the shared HTTP client and cached NEAR accounts when the server shuts down (_http() reopens the client on next use)."""
+    try:
+        yield {}
+    finally:
+        await _HTTP.aclose()
+        for _, acc in _ACCOUNTS.values():
+            _retire_account(acc)
+        _ACCOUNTS.clear()
+        await _close_retired_accounts(force=True)
+
+mcp = FastMCP(name="nova-mcp", lifespan=_lifespan)
+
+# Deployment config, read once at import instead of per tool call
+RPC_URL = os.environ.get("RPC_URL")  # Required; checked when a tool first needs it (see _required)
+CONTRACT_ID = os.environ.get("CONTRACT_ID")  # Required unless every call passes contract_id
+NEAR_PRIVATE_KEY = os.environ.get("NEAR_PRIVATE_KEY", "")
+SIGNER_ACCOUNT_ID = os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
+# Attached deposits in yoctoNEAR (1 NEAR = 10**24)
+AMOUNT_REGISTER = 100_000_000_000_000_000_000_000  # 0.1 NEAR
+AMOUNT_MEMBER = 500_000_000_000_000_000_000  # 0.0005 NEAR (add/revoke)
+AMOUNT_STORE = 500_000_000_000_000_000_000  # 0.0005 NEAR
+AMOUNT_RECORD = 2_000_000_000_000_000_000_000  # 0.002 NEAR
+PINATA_PIN_URL = "https://api.pinata.cloud/pinning/pinFileToIPFS"
+PINATA_HEADERS = {
+    "pinata_api_key": os.environ.get("IPFS_API_KEY", ""),
+    "pinata_secret_api_key": os.environ.get("IPFS_API_SECRET", "")
+}
+PUBLIC_GATEWAYS = ("https://gateway.pinata.cloud/ipfs", "https://ipfs.io/ipfs", "https://dweb.link/ipfs")
+PINATA_GATEWAY = os.environ.get("PINATA_GATEWAY", "").rstrip('/') or PUBLIC_GATEWAYS[0]
+GATEWAYS = tuple(dict.fromkeys((PINATA_GATEWAY,) + PUBLIC_GATEWAYS))  # Custom gateway first, no duplicates
+_GATEWAY_STAGGER = 15.0 / len(GATEWAYS)  # Request timeout spread across the gateways
+
+_HTTP_MAX_CONNECTIONS = 32
+# Shared async keep-alive pool for Pinata API/gateway calls (httpx ships with py_near; no thread hop per request).
+# HTTP/2 multiplexes concurrent gateway fetches/uploads over one connection per host.
+def _new_http_client() -> httpx.AsyncClient:
+    """Internal: Builds the shared client."""
+    return httpx.AsyncClient(
+        http2=True,
+        headers={'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'},
+        limits=httpx.Limits(max_connections=_HTTP_MAX_CONNECTIONS, max_keepalive_connections=16),
+        timeout=15.0
+    )
+
+_HTTP = _new_http_client()
+
+def _http() -> httpx.AsyncClient:
+    """Internal: Returns the shared client, reopening it if a lifespan exit closed it (FastMCP runs a lifespan per
+    in-process Client(mcp) session, so the module keeps serving after one ends)."""
+    global _HTTP
+    if _HTTP.is_closed:
+        _HTTP = _new_http_client()
+    return _HTTP
+
+class CircuitBreaker:
+    """Fails fast after fail_threshold consecutive failures; once open, lets one probe through per reset_after seconds."""
+
+    def __init__(self, fail_threshold: int = 5, reset_after: float = 30):
+        self.fail_threshold = fail_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_after:
+            return False
+        self.opened_at = time.monotonic()  # Half-open: this call is the probe, others keep failing fast
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.fail_threshold:
+            self.opened_at = time.monotonic()
+
+class TokenBucket:
+    """Client-side rate limit: refills rate tokens/s up to capacity; acquire() waits its turn or raises if the queue is too long."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self, max_wait: float = 30):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1  # Reserve now; a negative balance is the queue ahead of this caller
+        wait = -self.tokens / self.rate
+        if wait > max_wait:
+            self.tokens += 1
+            raise Exception(f"agent.rate_limited: Pinata request budget exhausted, retry after {wait:.0f}s")
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.tokens += 1  # Give the slot back (e.g. a losing gateway race)
+                raise
+
+# Pinata rate limits (API and its gateways), enforced before sending instead of learning from 429s
+PINATA_RATE = float(os.environ.get("PINATA_RATE", 3))  # Requests per second
+PINATA_BURST = int(os.environ.get("PINATA_BURST", 10))
+_RATE_LIMITS = {url: TokenBucket(PINATA_RATE, PINATA_BURST) for url in (PINATA_PIN_URL, PINATA_GATEWAY, PUBLIC_GATEWAYS[0])}
+
+_GATEWAY_RETRIES = 5
+# One breaker per upstream (gateway base URL, Pinata API, NEAR RPC); the threshold stays above the per-call
+# retry count so no single call can open a breaker on its own
+_CIRCUITS = defaultdict(lambda: CircuitBreaker(fail_threshold=_GATEWAY_RETRIES + 1))
+# Bulkheads: cap in-flight requests per upstream so bursts queue here instead of triggering 429s downstream
+# Sized so uploads plus every gateway at its cap fit in _HTTP's connection pool (no waiting on pool slots)
+_PINATA_API_CONCURRENCY = 8
+_PINATA_API_SEM = asyncio.Semaphore(_PINATA_API_CONCURRENCY)
+_GATEWAY_SEMS = defaultdict(lambda: asyncio.Semaphore((_HTTP_MAX_CONNECTIONS - _PINATA_API_CONCURRENCY) // len(GATEWAYS)))
+# Uploads may stream large bodies slowly, but connecting, pool waits and Pinata's reply stay bounded so a hung
+# request cannot hold an upload slot forever
+_UPLOAD_TIMEOUT = httpx.Timeout(connect=10.0, read=60.0, write=300.0, pool=30.0)
+_NEAR_RPC_SEM = asyncio.Semaphore(32)
+_RPC_DOWN_ERRORS = (RpcNotAvailableError, RpcEmptyResponse, RPCTimeoutError, httpx.TransportError)
+
+async def _rpc(call):
+    """Internal: Awaits a py_near call behind the NEAR RPC circuit breaker."""
+    breaker = _CIRCUITS[RPC_URL]
+    if not breaker.allow():
+        call.close()
+        raise Exception(f"NEAR RPC unavailable (circuit open): {RPC_URL}")
+    try:
+        async with _NEAR_RPC_SEM:
+            result = await call
+    except Exception as e:
+        if isinstance(e, _RPC_DOWN_ERRORS):
+            breaker.record_failure()
+        else:
+            breaker.record_success()  # Contract/tx error: the RPC itself answered
+        raise
+    breaker.record_success()
+    return result
+
+def _required(value: str, name: str) -> str:
+    """Internal: Returns a deployment setting, or raises naming the missing environment variable."""
+    if not value:
+        raise Exception(f"{name} is not set: add it to the environment or .env")
+    return value
+
+def _contract_id(contract_id: str = None) -> str:
+    """Internal: Caller-supplied contract_id, else the CONTRACT_ID setting."""
+    return contract_id or _required(CONTRACT_ID, "CONTRACT_ID")
+
+_NEAR_KEY_RE = re.compile(r'[1-9A-HJ-NP-Za-km-z]{64,}')  # base58 alphabet
+# CIDv0 (Qm + base58) or CIDv1 in the multibase encodings gateways accept: base32 (b), base58btc (z), base16 (f)
+_CID_RE = re.compile(r'Qm[1-9A-HJ-NP-Za-km-z]{44}|b[a-z2-7]{58,}|z[1-9A-HJ-NP-Za-km-z]{46,}|f[0-9a-f]{70,}')
 
 def _validate_near_key(private_key: str) -> str:
     """Light validation: base58, 64 chars (ed25519)."""
-    if not private_key or len(private_key) < 64 or not re.match(r'^[1-9A-HJ-NP-Za-km-z]{64,}$', private_key):
+    if not private_key or not _NEAR_KEY_RE.fullmatch(private_key):
         raise ValueError("Invalid NEAR private_key: Must be base58-encoded (64+ chars, no prefix).")
     return private_key
 
+def _normalize_cid(cid: str) -> str:
+    """Light validation: strips stray slashes/whitespace, then requires a CIDv0/CIDv1 string."""
+    cid = cid.strip('/ \t\r\n')
+    if not _CID_RE.fullmatch(cid):
+        raise Exception(f"Invalid CID: {cid}")
+    return cid
+
+# Started Accounts: (account_id, private_key, rpc) -> (expires_at, Account); startup() costs an RPC round-trip per call otherwise.
+# The TTL re-runs startup() periodically so access-key rotations and RPC changes are picked up; at most
+# _ACCOUNT_MAXSIZE signers are kept (oldest evicted first). Views go through one shared keyless Account.
+_ACCOUNT_TTL = 600
+_ACCOUNT_MAXSIZE = 64
+_ACCOUNT_CLOSE_GRACE = 120  # Replaced Accounts may still have a call in flight; closed after this many seconds
+_ACCOUNTS = {}
+_ACCOUNT_LOCKS = defaultdict(asyncio.Lock)
+_RETIRED_ACCOUNTS = []  # (close_at, Account)
+
+def _retire_account(acc: Account):
+    """Internal: Schedules an expired/evicted Account for shutdown once in-flight calls have had time to finish."""
+    _RETIRED_ACCOUNTS.append((time.monotonic() + _ACCOUNT_CLOSE_GRACE, acc))
+
+async def _close_account(acc: Account):
+    """Internal: Shuts down an Account and its own httpx client (py_near's provider shutdown() leaves it open)."""
+    await acc.shutdown()
+    client = getattr(getattr(acc, "_provider", None), "_client", None)
+    if client is not None:
+        await client.aclose()
+
+async def _close_retired_accounts(force: bool = False):
+    """Internal: Closes retired Accounts whose grace period has passed (all of them if force)."""
+    now = time.monotonic()
+    due = [acc for close_at, acc in _RETIRED_ACCOUNTS if force or close_at <= now]
+    _RETIRED_ACCOUNTS[:] = [(close_at, acc) for close_at, acc in _RETIRED_ACCOUNTS if not (force or close_at <= now)]
+    for acc in due:
+        try:
+            await _close_account(acc)
+        except Exception as e:
+            logger.warning("Account shutdown failed: {}", e)
+
+async def _get_account(account_id: str, private_key: str, rpc: str) -> Account:
+    """Internal: Returns a started Account, reused across calls for the same signer (for up to _ACCOUNT_TTL seconds)."""
+    rpc = _required(rpc, "RPC_URL")
+    cache_key = (account_id, private_key, rpc)
+    cached = _ACCOUNTS.get(cache_key)
+    if cached is None or cached[0] <= time.monotonic():
+        async with _ACCOUNT_LOCKS[cache_key]:
+            cached = _ACCOUNTS.get(cache_key)
+            if cached is None or cached[0] <= time.monotonic():
+                await _close_retired_accounts()
+                acc = Account(account_id, private_key, rpc)
+                try:
+                    await _rpc(acc.startup())
+                except Exception:
+                    await _close_account(acc)
+                    raise
+                if cached is not None:
+                    _retire_account(_ACCOUNTS.pop(cache_key)[1])  # Expired entry for this signer
+                while len(_ACCOUNTS) >= _ACCOUNT_MAXSIZE:
+                    evicted_key = next(iter(_ACCOUNTS))
+                    _retire_account(_ACCOUNTS.pop(evicted_key)[1])
+                    lock = _ACCOUNT_LOCKS.get(evicted_key)
+                    if lock is not None and not lock.locked():
+                        del _ACCOUNT_LOCKS[evicted_key]
+                cached = _ACCOUNTS[cache_key] = (time.monotonic() + _ACCOUNT_TTL, acc)
+    return cached[1]
+
+async def _view_account() -> Account:
+    """Internal: Shared keyless Account for view calls (views need no signer, so one serves every user_id)."""
+    return await _get_account(None, None, RPC_URL)
+
+# get_group_key results: (group_id, user_id, contract_id) -> (expires_at, key); dropped when the group key rotates
+_GROUP_KEY_TTL = 60
+_GROUP_KEYS = {}
+# Membership views: (group_id, user_id, contract_id, method) -> (expires_at, result); dropped on group writes
+_VIEW_TTL = 10
+_VIEWS = {}
+_CACHE_MAXSIZE = 1024
+
+def _cache_put(cache: dict, cache_key: tuple, ttl: float, value):
+    """Internal: Stores a TTL entry, evicting expired then oldest entries past _CACHE_MAXSIZE."""
+    now = time.monotonic()
+    if len(cache) >= _CACHE_MAXSIZE:
+        for k in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+            del cache[k]
+        while len(cache) >= _CACHE_MAXSIZE:
+            del cache[next(iter(cache))]
+    cache[cache_key] = (now + ttl, value)
+
+# Per-group write generation: (group_id, contract_id) -> int, bumped on every invalidation. A lookup that
+# started under an older generation raced a write and must not repopulate the caches with pre-write state.
+_GROUP_GENS = {}
+# Groups with a wait=False tx that may not have executed yet: (group_id, contract_id) -> monotonic deadline.
+# Until then nothing is cached for the group, so pre-transaction state cannot be pinned for a full TTL. A tx still
+# unexecuted after _PENDING_TX_TTL can leave pre-transaction state cached for up to _GROUP_KEY_TTL (key) or
+# _VIEW_TTL (membership); composite_upload never uses the cached key, so it is unaffected.
+_PENDING_TX_TTL = 30
+_GROUP_UNCACHED_UNTIL = {}
+
+def _invalidate_group_keys(group_id: str, contract_id: str, pending: bool = False):
+    """Internal: Drops cached keys and membership views for a group (after register/add/revoke/store).
+    pending=True (tx broadcast without waiting) also stops caching the group for _PENDING_TX_TTL seconds."""
+    _GROUP_GENS[(group_id, contract_id)] = _GROUP_GENS.get((group_id, contract_id), 0) + 1
+    if pending:
+        _GROUP_UNCACHED_UNTIL[(group_id, contract_id)] = time.monotonic() + _PENDING_TX_TTL
+    for cache in (_GROUP_KEYS, _VIEWS):
+        for cache_key in [k for k in cache if k[0] == group_id and k[2] == contract_id]:
+            del cache[cache_key]
+
+def _group_cacheable(group_id: str, contract_id: str, gen: int) -> bool:
+    """Internal: True if a lookup started under generation gen may use/fill the group's caches."""
+    until = _GROUP_UNCACHED_UNTIL.get((group_id, contract_id))
+    if until is not None:
+        if until > time.monotonic():
+            return False
+        del _GROUP_UNCACHED_UNTIL[(group_id, contract_id)]
+    return _GROUP_GENS.get((group_id, contract_id), 0) == gen
+
 # Helper functions (callable internally)
-async def _get_group_key(group_id: str, user_id: str, contract_id: str, private_key: str = None) -> str:
-    """Internal: Retrieves key (async py_near calls)."""
-    rpc = os.environ["RPC_URL"]
-    private_key = private_key or os.environ.get("NEAR_PRIVATE_KEY", "")
+async def _get_group_key(group_id: str, user_id: str, contract_id: str, private_key: str = None, use_cache: bool = True) -> str:
+    """Internal: Retrieves key (async py_near calls, cached for _GROUP_KEY_TTL seconds; use_cache=False always reads the chain)."""
+    rpc = RPC_URL
+    private_key = private_key or NEAR_PRIVATE_KEY
     private_key = _validate_near_key(private_key)
+    cache_key = (group_id, user_id, contract_id)
+    gen = _GROUP_GENS.get((group_id, contract_id), 0)
+    cached = _GROUP_KEYS.get(cache_key)
+    if use_cache and cached and cached[0] > time.monotonic() and _group_cacheable(group_id, contract_id, gen):
+        return cached[1]
     try:
-        acc = Account(user_id, private_key, rpc)
-        await acc.startup()
-        result = await acc.view_function(
+        acc = await _get_account(user_id, private_key, rpc)
+        result = await _rpc(acc.view_function(
             contract_id=contract_id,
             method_name="get_group_key",
             args={"group_id": group_id, "user_id": user_id}
-        )
+        ))
         key = result.result  # Str base64
         if not key:
             raise Exception(f"No key for {group_id}/{user_id}")
         key_bytes = base64.b64decode(key)
         if len(key_bytes) != 32:
             raise Exception(f"Invalid key length: {len(key_bytes)}")
-        print(f"Retrieved key for {group_id}/{user_id}: {key[:10]}...")  # Debug
+        logger.debug("Retrieved key for {}/{}", group_id, user_id)
+        if _group_cacheable(group_id, contract_id, gen):  # No write landed (or is pending) while the view was in flight
+            _cache_put(_GROUP_KEYS, cache_key, _GROUP_KEY_TTL, key)
         return key
     except Exception as e:
         if "Unauthorized" in str(e):
-            raise Exception("Unauthorized access: Provide your group member account_id and private_key. Or request access from the group owner.")
-        raise Exception(f"Get failed: {str(e)}")
+            raise Exception("Unauthorized access: Provide your group member account_id and private_key. Or request access from the group owner.") from e
+        raise Exception(f"Get failed: {str(e)}") from e
     
 async def _group_contains_key(group_id: str, contract_id: str) -> bool:
-    """Internal: Check if group exists (view)."""
-    rpc = os.environ["RPC_URL"]
-    private_key = os.environ.get("NEAR_PRIVATE_KEY", "")  # Dummy
-    acc = Account("dummy", private_key, rpc)  # Dummy for view
-    await acc.startup()
-    result = await acc.view_function(
+    """Internal: Check if group exists (view, cached for _VIEW_TTL seconds)."""
+    cache_key = (group_id, None, contract_id, "group_contains_key")
+    gen = _GROUP_GENS.get((group_id, contract_id), 0)
+    cached = _VIEWS.get(cache_key)
+    if cached and cached[0] > time.monotonic() and _group_cacheable(group_id, contract_id, gen):
+        return cached[1]
+    acc = await _view_account()
+    result = await _rpc(acc.view_function(
         contract_id=contract_id,
         method_name="group_contains_key",
         args={"group_id": group_id}
-    )
+    ))
+    if _group_cacheable(group_id, contract_id, gen):
+        _cache_put(_VIEWS, cache_key, _VIEW_TTL, result.result)
     return result.result
 
 async def _is_authorized(group_id: str, user_id: str, contract_id: str) -> bool:
-    """Internal: Check authorization (view)."""
-    rpc = os.environ["RPC_URL"]
-    private_key = os.environ.get("NEAR_PRIVATE_KEY", "")  # Dummy
-    acc = Account(user_id, private_key, rpc)
-    await acc.startup()
-    result = await acc.view_function(
+    """Internal: Check authorization (view, cached for _VIEW_TTL seconds)."""
+    cache_key = (group_id, user_id, contract_id, "is_authorized")
+    gen = _GROUP_GENS.get((group_id, contract_id), 0)
+    cached = _VIEWS.get(cache_key)
+    if cached and cached[0] > time.monotonic() and _group_cacheable(group_id, contract_id, gen):
+        return cached[1]
+    acc = await _view_account()
+    result = await _rpc(acc.view_function(
         contract_id=contract_id,
         method_name="is_authorized",
         args={"group_id": group_id, "user_id": user_id}
-    )
+    ))
+    if _group_cacheable(group_id, contract_id, gen):
+        _cache_put(_VIEWS, cache_key, _VIEW_TTL, result.result)
     return result.result
 
-def _encrypt_data(data: str, key: str) -> str:
-    """Internal: Encrypts (same as tool)."""
-    data_bytes = base64.b64decode(data)
-    key_bytes = base64.b64decode(key)[:32]
+@functools.lru_cache(maxsize=32)
+def _key_bytes(key: str) -> bytes:
+    """Internal: Decodes base64 group key to AES-256 key bytes (cached, same key repeats per group)."""
+    return base64.b64decode(key)[:32]
+
+@functools.lru_cache(maxsize=32)
+def _aes(key_bytes: bytes) -> algorithms.AES:
+    """Internal: AES algorithm object per key (cached; only the CBC mode/IV is rebuilt per call)."""
+    return algorithms.AES(key_bytes)
+
+_PKCS7_PADS = tuple(bytes([n]) * n for n in range(1, 17))  # PKCS#7 pad block for each pad length
+
+def _encrypt_bytes(data_bytes: bytes, key_bytes: bytes) -> bytes:
+    """Internal: Encrypts raw bytes with 32-byte key, returns IV || ciphertext."""
     iv = os.urandom(16)
-    cipher = Cipher(algorithms.AES(key_bytes), modes.CBC(iv), backend=default_backend())
+    cipher = Cipher(_aes(key_bytes), modes.CBC(iv))
     encryptor = cipher.encryptor()
     pad_len = 16 - (len(data_bytes) % 16)
-    padded = data_bytes + bytes([pad_len] * pad_len)
-    encrypted = encryptor.update(padded) + encryptor.finalize()
-    return base64.b64encode(iv + encrypted).decode('utf-8')
+    # Feed padding as a separate update so the plaintext is never copied into a padded buffer; one join builds
+    # the bytes object httpx uploads as-is (a bytearray would need another full copy at upload time)
+    return b"".join((iv, encryptor.update(data_bytes), encryptor.update(_PKCS7_PADS[pad_len - 1]), encryptor.finalize()))
 
-def _decrypt_data(encrypted: str, key: str) -> str:
-    """Internal: Decrypts (same as tool)."""
-    encrypted_bytes = base64.b64decode(encrypted)
+def _encrypt_data(data: str, key: str) -> str:
+    """Internal: Encrypts (same as tool)."""
+    return base64.b64encode(_encrypt_bytes(base64.b64decode(data), _key_bytes(key))).decode('utf-8')
+
+def _decrypt_bytes(encrypted_bytes: bytes, key_bytes: bytes) -> bytes:
+    """Internal: Decrypts IV || ciphertext with 32-byte key, returns raw bytes."""
     if len(encrypted_bytes) < 16:
         raise ValueError(f"Invalid encrypted data length: {len(encrypted_bytes)} (must be >=16 for IV)")
-    key_bytes = base64.b64decode(key)[:32]
-    iv = encrypted_bytes[:16]
-    ciphertext = encrypted_bytes[16:]
-    cipher = Cipher(algorithms.AES(key_bytes), modes.CBC(iv), backend=default_backend())
+    view = memoryview(encrypted_bytes)  # Slice IV/ciphertext without copying the payload
+    iv = view[:16].tobytes()
+    ciphertext = view[16:]
+    cipher = Cipher(_aes(key_bytes), modes.CBC(iv))
     decryptor = cipher.decryptor()
     decrypted_padded = decryptor.update(ciphertext) + decryptor.finalize()
-    pad_len = decrypted_padded[-1]
-    decrypted = decrypted_padded[:-pad_len]
-    return base64.b64encode(decrypted).decode('utf-8')
-
-def _ipfs_upload(encrypted_b64: str, filename: str) -> str:
-    """Internal: Uploads (same as tool)."""
-    encrypted_data = base64.b64decode(encrypted_b64)
-    url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
-    headers = {
-        "pinata_api_key": os.environ["IPFS_API_KEY"],
-        "pinata_secret_api_key": os.environ["IPFS_API_SECRET"]
-    }
-    files = {"file": (filename, encrypted_data)}
-    response = requests.post(url, headers=headers, files=files)
+    pad_len = decrypted_padded[-1] if decrypted_padded else 0
+    # Full PKCS#7 check (C-level endswith); a wrong key or truncated blob fails here instead of returning garbage
+    if not 1 <= pad_len <= 16 or not decrypted_padded.endswith(_PKCS7_PADS[pad_len - 1]):
+        raise ValueError("Invalid PKCS#7 padding (wrong key or corrupted data)")
+    return decrypted_padded[:-pad_len]
+
+def _decrypt_data(encrypted: str, key: str) -> str:
+    """Internal: Decrypts (same as tool)."""
+    return base64.b64encode(_decrypt_bytes(base64.b64decode(encrypted), _key_bytes(key))).decode('utf-8')
+
+def _decode_and_hash(data: str) -> tuple:
+    """Internal: Decodes base64 payload, returns (bytes, sha256 hex) for upload."""
+    data_bytes = base64.b64decode(data)
+    return data_bytes, hashlib.sha256(data_bytes).hexdigest()
+
+def _decrypt_and_hash(encrypted_bytes: bytes, key_bytes: bytes) -> tuple:
+    """Internal: Decrypts IV || ciphertext, returns (plaintext bytes, sha256 hex) for retrieve."""
+    data_bytes = _decrypt_bytes(encrypted_bytes, key_bytes)
+    return data_bytes, hashlib.sha256(data_bytes).hexdigest()
+
+async def _ipfs_upload_bytes(encrypted_data: bytes, filename: str) -> str:
+    """Internal: Uploads raw encrypted bytes to Pinata, returns CID."""
+    if not PINATA_HEADERS["pinata_api_key"] or not PINATA_HEADERS["pinata_secret_api_key"]:
+        raise Exception("Upload failed: IPFS_API_KEY/IPFS_API_SECRET not set")
+    breaker = _CIRCUITS[PINATA_PIN_URL]
+    if not breaker.allow():
+        raise Exception("Upload failed: Pinata API unavailable (circuit open)")
+    await _RATE_LIMITS[PINATA_PIN_URL].acquire()
+    files = {"file": (filename, encrypted_data)}  # httpx streams bytes parts as-is
+    try:
+        async with _PINATA_API_SEM:
+            response = await _http().post(PINATA_PIN_URL, headers=PINATA_HEADERS, files=files, timeout=_UPLOAD_TIMEOUT)
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
     if response.status_code == 200:
         return response.json()["IpfsHash"]
     raise Exception(f"Upload failed: {response.text}")
 
-async def _ipfs_retrieve(cid: str) -> str:
-    """Internal: Retrieves data from IPFS via gateway (fallback to public)."""
-    # Try custom gateway first
-    gateway = os.environ.get("PINATA_GATEWAY", "").rstrip('/')
-    if not gateway:
-        gateway = "https://gateway.pinata.cloud/ipfs"
-    url = f"{gateway}/{cid.lstrip('/').strip()}"
-    if not cid.startswith('Qm'):
-        raise Exception(f"Invalid CID: {cid}")
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    max_retries = 5
+async def _ipfs_upload(encrypted_b64: str, filename: str) -> str:
+    """Internal: Uploads base64 encrypted data (same as tool)."""
+    return await _ipfs_upload_bytes(base64.b64decode(encrypted_b64), filename)
+
+class _GatewayOutage(Exception):
+    """Internal: A gateway failure that says the gateway itself is down, not that one CID is unavailable."""
+
+# Outage signals: unreachable gateway or 502/503. 404/504 and read timeouts usually mean the gateway could not
+# resolve that one CID, so they must not open the breaker for every other CID.
+_GATEWAY_OUTAGE_STATUSES = (502, 503)
+_CID_SPECIFIC_ERRORS = (httpx.ReadTimeout, httpx.PoolTimeout)
+
+async def _gateway_fetch(gateway: str, cid: str) -> bytes:
+    """Internal: Retrieves raw data from one IPFS gateway (retries with backoff; at most one breaker failure per call)."""
+    url = f"{gateway}/{cid}"
+    max_retries = _GATEWAY_RETRIES
+    breaker = _CIRCUITS[gateway]
+    sem = _GATEWAY_SEMS[gateway]
+    bucket = _RATE_LIMITS.get(gateway)  # Only Pinata gateways are rate limited client-side
     for attempt in range(max_retries):
+        if not breaker.allow():
+            raise Exception(f"Gateway unavailable (circuit open): {gateway}")
+        if bucket:
+            await bucket.acquire()
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            async with sem:  # Held for the request only, not the backoff sleep
+                response = await _http().get(url)
+            if response.status_code not in _GATEWAY_OUTAGE_STATUSES:
+                breaker.record_success()  # The gateway answered, even if it cannot serve this CID
             if response.status_code == 200 and response.content:
-                return base64.b64encode(response.content).decode('utf-8')
+                return response.content
             elif response.status_code == 400:
                 raise Exception(f"Invalid path/CID: {response.text[:100]}")
             elif response.status_code == 429:
-                wait = 10 * (2 ** attempt)
-                time.sleep(wait)
+                # Honour the gateway's Retry-After (seconds form); otherwise full-jitter exponential backoff. Both capped at 60 s
+                retry_after = response.headers.get("Retry-After", "")
+                wait = min(int(retry_after), 60) if retry_after.isdigit() else random.uniform(0, min(60, 10 * (2 ** attempt)))
+                await asyncio.sleep(wait)
                 continue
+            elif response.status_code in _GATEWAY_OUTAGE_STATUSES:
+                raise _GatewayOutage(f"Failed {response.status_code}: {response.text[:100]}")
             else:
                 raise Exception(f"Failed {response.status_code}: {response.text[:100]}")
         except Exception as e:
+            if isinstance(e, httpx.TransportError) and not isinstance(e, _CID_SPECIFIC_ERRORS):
+                e = _GatewayOutage(f"Gateway unreachable: {e!r}")
             if attempt < max_retries - 1:
-                time.sleep(5 * (attempt + 1))
+                await asyncio.sleep(random.uniform(0, min(30, 2 ** attempt)))
                 continue
-            # Fallback to public gateway on final fail
-            if gateway != "https://gateway.pinata.cloud/ipfs":
-                print(f"Custom gateway failed, falling back to public: {e}")
-                gateway = "https://gateway.pinata.cloud/ipfs"
-                url = f"{gateway}/{cid.lstrip('/').strip()}"
-                response = requests.get(url, headers=headers, timeout=15)
-                if response.status_code == 200 and response.content:
-                    return base64.b64encode(response.content).decode('utf-8')
+            if isinstance(e, _GatewayOutage):
+                breaker.record_failure()  # Once per call, only when the final attempt still looked like an outage
             raise e
     raise Exception(f"Failed after {max_retries} retries")
 
+# Per-gateway EWMA of successful fetch time (s) and consecutive outage failures; the race tries the fastest healthy gateway first
+_GATEWAY_STATS = defaultdict(lambda: {"ewma": 1.0, "fails": 0})
+
+def _gateway_score(gateway: str) -> float:
+    """Internal: Race order key; gateways failing more than 3 times in a row drop behind healthy ones."""
+    stats = _GATEWAY_STATS[gateway]
+    return stats["ewma"] + (60 if stats["fails"] > 3 else 0)
+
+async def _timed_gateway_fetch(gateway: str, cid: str) -> bytes:
+    """Internal: _gateway_fetch that feeds _GATEWAY_STATS (cancelled race losers and CID-specific errors are not counted)."""
+    stats = _GATEWAY_STATS[gateway]
+    start = time.monotonic()
+    try:
+        data = await _gateway_fetch(gateway, cid)
+    except _GatewayOutage:
+        stats["fails"] += 1
+        raise
+    stats["ewma"] = 0.8 * stats["ewma"] + 0.2 * (time.monotonic() - start)
+    stats["fails"] = 0
+    return data
+
+# Raw gateway bodies by CID (content-addressed, so never stale); LRU bounded by entry count and total bytes
+_CID_CACHE_MAX_ENTRIES = 128
+_CID_CACHE_MAX_BYTES = int(os.environ.get("IPFS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+_CID_CACHE_ITEM_MAX_BYTES = int(os.environ.get("IPFS_CACHE_ITEM_MAX_BYTES", 8 * 1024 * 1024))  # Larger bodies are not cached
+_CID_CACHE = OrderedDict()
+_cid_cache_bytes = 0
+
+def _cid_cache_put(cid: str, data: bytes):
+    """Internal: Caches a gateway body, evicting least recently used entries past the caps."""
+    global _cid_cache_bytes
+    if len(data) > _CID_CACHE_ITEM_MAX_BYTES or cid in _CID_CACHE:
+        return
+    _CID_CACHE[cid] = data
+    _cid_cache_bytes += len(data)
+    while len(_CID_CACHE) > _CID_CACHE_MAX_ENTRIES or _cid_cache_bytes > _CID_CACHE_MAX_BYTES:
+        _, evicted = _CID_CACHE.popitem(last=False)
+        _cid_cache_bytes -= len(evicted)
+
+async def _ipfs_retrieve_bytes(cid: str) -> bytes:
+    """Internal: Retrieves raw data from IPFS (LRU cached), racing GATEWAYS fastest-first (first success wins)."""
+    cid = _normalize_cid(cid)
+    cached = _CID_CACHE.get(cid)
+    if cached is not None:
+        _CID_CACHE.move_to_end(cid)
+        return cached
+    # Staggered race: the next gateway starts after _GATEWAY_STAGGER seconds (or as soon as one fails)
+    gateways = iter(sorted(GATEWAYS, key=_gateway_score))  # Stable: ties keep the configured order
+    pending = set()
+    errors = []
+    try:
+        while True:
+            gateway = next(gateways, None)
+            if gateway:
+                pending.add(asyncio.create_task(_timed_gateway_fetch(gateway, cid)))
+            elif not pending:
+                raise errors[0]
+            done, pending = await asyncio.wait(pending, timeout=_GATEWAY_STAGGER if gateway else None, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    data = task.result()
+                except Exception as e:
+                    logger.warning("Gateway fetch failed for {}: {}", cid, e)
+                    errors.append(e)
+                    continue
+                _cid_cache_put(cid, data)
+                return data
+    finally:
+        for task in pending:
+            task.cancel()  # Losers stop retrying once a gateway has answered
+
+_RETRIEVE_MANY_LIMIT = 16  # Concurrent CIDs per batch call; keeps bulk fetches under gateway rate limits
+
+async def _ipfs_retrieve(cid: str) -> str:
+    """Internal: Retrieves data from IPFS as base64 (same as tool)."""
+    return base64.b64encode(await _ipfs_retrieve_bytes(cid)).decode('utf-8')
+
 async def _record_near_transaction(group_id: str, user_id: str, file_hash: str, ipfs_hash: str, contract_id: str, account_id: str, private_key: str) -> str:
     """Internal: Records (async)."""
-    rpc = os.environ["RPC_URL"]
+    rpc = RPC_URL
     private_key = _validate_near_key(private_key)
-    near = Account(account_id, private_key, rpc)
-    await near.startup()  # Initialize account for async calls (added)
-    result = await near.function_call(
+    near = await _get_account(account_id, private_key, rpc)
+    result = await _rpc(near.function_call(
         contract_id=contract_id,
         method_name="record_transaction",
         args={"group_id": group_id, "user_id": user_id, "file_hash": file_hash, "ipfs_hash": ipfs_hash},
-        amount=int("2000000000000000000000")  # 0.002 NEAR yocto
-    )
+        amount=AMOUNT_RECORD
+    ))
     if "SuccessValue" in result.status:
         trans_id = result.status['SuccessValue']  # Direct str/hex
-        print(f"Recorded tx: {trans_id}")  # Log for debug (kept from failing)
+        logger.debug("Recorded tx: {}", trans_id)
         return trans_id
     raise Exception(f"Record failed (check owner auth): {result.status}. Authentication required: Provide your account_id and private_key as the smart contract owner. Or deploy your own contract via `near deploy` and pass `contract_id`.")
 
+async def _decrypt_result(encrypted: bytes, key: str) -> dict:
+    """Internal: Decrypts and hashes fetched bytes off the event loop; stays in bytes, base64 only once for the tool result."""
+    decrypted_data, file_hash = await asyncio.to_thread(_decrypt_and_hash, encrypted, _key_bytes(key))
+    logger.debug("Composite retrieve success: {} bytes, hash={}", len(decrypted_data), file_hash)
+    return {"decrypted_b64": base64.b64encode(decrypted_data).decode('utf-8'), "file_hash": file_hash}
+
+async def _composite_retrieve(group_id: str, ipfs_hash: str, account_id: str, private_key: str, contract_id: str) -> dict:
+    """Internal: get_key (member) → fetch IPFS → decrypt → hash (same as composite_retrieve tool)."""
+    # Steps 1+2: Fetch key (member auth) and raw bytes from IPFS concurrently; independent of each other
+    key, encrypted = await asyncio.gather(
+        _get_group_key(group_id, account_id, contract_id, private_key),
+        _ipfs_retrieve_bytes(ipfs_hash)
+    )
+    # Steps 3+4: Decrypt and hash for verification (user-side compare to on-chain)
+    return await _decrypt_result(encrypted, key)
+
 # Tools for direct external use (non-restricted)
 @mcp.tool
-def ipfs_upload(data: str, filename: str) -> str:
+async def ipfs_upload(data: str, filename: str) -> str:  # Now async
     """Uploads encrypted data to IPFS via Pinata and returns CID."""
-    data_bytes = base64.b64decode(data)
-    url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
-    headers = {
-        "pinata_api_key": os.environ["IPFS_API_KEY"],
-        "pinata_secret_api_key": os.environ["IPFS_API_SECRET"]
-    }
-    files = {"file": (filename, data_bytes)}
-    response = requests.post(url, headers=headers, files=files)
-    if response.status_code == 200:
-        return response.json()["IpfsHash"]
-    raise Exception(f"Upload failed: {response.text}")
+    return await _ipfs_upload(data, filename)
 
 @mcp.tool
 async def ipfs_retrieve(cid: str) -> str:  # Returns base64 bytes (now async)
@@ -199,200 +635,254 @@ async def ipfs_retrieve(cid: str) -> str:  # Returns base64 bytes (now async)
     return await _ipfs_retrieve(cid)
 
 @mcp.tool
-def encrypt_data(data: str, key: str) -> str:  # Input b64 data/key; return b64 encrypted
+async def ipfs_retrieve_many(cids: list[str]) -> list[dict]:
+    """Retrieves several CIDs concurrently (at most 16 in flight). Returns [{'cid', 'data' (base64) or 'error'}] in input order."""
+    sem = asyncio.Semaphore(_RETRIEVE_MANY_LIMIT)
+    async def one(cid: str) -> str:
+        async with sem:
+            return await _ipfs_retrieve(cid)
+    results = await asyncio.gather(*(one(cid) for cid in cids), return_exceptions=True)
+    return [{"cid": cid, "error": str(r)} if isinstance(r, Exception) else {"cid": cid, "data": r} for cid, r in zip(cids, results)]
+
+@mcp.tool
+async def encrypt_data(data: str, key: str) -> str:  # Input b64 data/key; return b64 encrypted
     """Encrypts base64 data with AES-CBC key (32 bytes padded)."""
-    return _encrypt_data(data, key)
+    return await asyncio.to_thread(_encrypt_data, data, key)  # OpenSSL releases the GIL; keeps the loop free
 
 @mcp.tool
-def decrypt_data(encrypted: str, key: str) -> str:  # b64 in/out
+async def decrypt_data(encrypted: str, key: str) -> str:  # b64 in/out
     """Decrypts base64 encrypted data with AES-CBC key."""
-    return _decrypt_data(encrypted, key)
+    return await asyncio.to_thread(_decrypt_data, encrypted, key)
 
 # Tools for NOVA contract interaction (requires valid auth)
 @mcp.tool
-async def register_group(group_id: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> str:
-    """Registers new group on NOVA contract (owner only). Provide account_id/private_key as owner if not using default."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
-    account_id = account_id or os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
-    rpc = os.environ["RPC_URL"]
+async def register_group(group_id: str, account_id: str = None, private_key: str = None, contract_id: str = None, wait: bool = True) -> str:
+    """Registers new group on NOVA contract (owner only). Provide account_id/private_key as owner if not using default. wait=False returns the tx hash without waiting for execution."""
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
+    rpc = RPC_URL
     if await _group_contains_key(group_id, contract_id):
         raise Exception(f"Group {group_id} exists")
-    near = Account(account_id, private_key, rpc)
-    await near.startup()  # ADD THIS: Initialize account
-    result = await near.function_call(
+    near = await _get_account(account_id, private_key, rpc)
+    result = await _rpc(near.function_call(
         contract_id=contract_id,
         method_name="register_group",
         args={"group_id": group_id},
-        amount=int("100000000000000000000000")  # 0.01 NEAR yocto
-    )
+        amount=AMOUNT_REGISTER,
+        nowait=not wait
+    ))
+    _invalidate_group_keys(group_id, contract_id, pending=not wait)
+    if not wait:
+        return result  # Tx hash (broadcast_tx_async); check outcome on-chain
     if "SuccessValue" in result.status:
-        print(f"Registered group: {group_id}")
+        logger.info("Registered group: {}", group_id)
         return "Registered"
     raise Exception(f"Register failed (check owner auth): {result.status}. Authentication required: Provide your account_id and private_key as the smart contract owner. Or deploy your own contract via `near deploy` and pass `contract_id`.")
 
 @mcp.tool
-async def add_group_member(group_id: str, member_id: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> str:
-    """Adds member to group (owner only). Provide account_id/private_key as owner if not using default."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
-    account_id = account_id or os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
-    rpc = os.environ["RPC_URL"]
-    if not await _group_contains_key(group_id, contract_id):
+async def add_group_member(group_id: str, member_id: str, account_id: str = None, private_key: str = None, contract_id: str = None, wait: bool = True) -> str:
+    """Adds member to group (owner only). Provide account_id/private_key as owner if not using default. wait=False returns the tx hash without waiting for execution."""
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
+    rpc = RPC_URL
+    # Both views in one round-trip; is_authorized may fail for a missing group, so report that first
+    exists, authorized = await asyncio.gather(
+        _group_contains_key(group_id, contract_id),
+        _is_authorized(group_id, member_id, contract_id),
+        return_exceptions=True
+    )
+    if isinstance(exists, Exception):
+        raise exists
+    if not exists:
         raise Exception(f"Group {group_id} not found")
-    if await _is_authorized(group_id, member_id, contract_id):
+    if isinstance(authorized, Exception):
+        raise authorized
+    if authorized:
         raise Exception(f"User {member_id} already a member")
-    near = Account(account_id, private_key, rpc)
-    await near.startup()  # ADD THIS
-    result = await near.function_call(
+    near = await _get_account(account_id, private_key, rpc)
+    result = await _rpc(near.function_call(
         contract_id=contract_id,
         method_name="add_group_member",
         args={"group_id": group_id, "user_id": member_id},
-        amount=int("500000000000000000000")  # 0.0005 NEAR yocto
-    )
+        amount=AMOUNT_MEMBER,
+        nowait=not wait
+    ))
+    _invalidate_group_keys(group_id, contract_id, pending=not wait)
+    if not wait:
+        return result  # Tx hash (broadcast_tx_async); check outcome on-chain
     if "SuccessValue" in result.status:
-        print(f"Added {member_id} to {group_id}")
+        logger.info("Added {} to {}", member_id, group_id)
         return "Added"
     raise Exception(f"Add failed (check owner auth): {result.status}. Authentication required: Provide your account_id and private_key as the smart contract owner. Or deploy your own contract via `near deploy` and pass `contract_id`.")
 
 @mcp.tool
-async def revoke_group_member(group_id: str, member_id: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> str:
-    """Revokes member from group (owner only, rotates key). Provide account_id/private_key as owner if not using default."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
-    account_id = account_id or os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
-    rpc = os.environ["RPC_URL"]
-    if not await _group_contains_key(group_id, contract_id):
+async def revoke_group_member(group_id: str, member_id: str, account_id: str = None, private_key: str = None, contract_id: str = None, wait: bool = True) -> str:
+    """Revokes member from group (owner only, rotates key). Provide account_id/private_key as owner if not using default. wait=False returns the tx hash without waiting for execution."""
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
+    rpc = RPC_URL
+    # Both views in one round-trip; is_authorized may fail for a missing group, so report that first
+    exists, authorized = await asyncio.gather(
+        _group_contains_key(group_id, contract_id),
+        _is_authorized(group_id, member_id, contract_id),
+        return_exceptions=True
+    )
+    if isinstance(exists, Exception):
+        raise exists
+    if not exists:
         raise Exception(f"Group {group_id} not found")
-    if not await _is_authorized(group_id, member_id, contract_id):
+    if isinstance(authorized, Exception):
+        raise authorized
+    if not authorized:
         raise Exception(f"User {member_id} not a member")
-    near = Account(account_id, private_key, rpc)
-    await near.startup()  # Initialize account for async calls
-    result = await near.function_call(
+    near = await _get_account(account_id, private_key, rpc)
+    result = await _rpc(near.function_call(
         contract_id=contract_id,
         method_name="revoke_group_member",
         args={"group_id": group_id, "user_id": member_id},
-        amount=int("500000000000000000000")  # 0.0005 NEAR yocto
-    )
+        amount=AMOUNT_MEMBER,
+        nowait=not wait
+    ))
+    _invalidate_group_keys(group_id, contract_id, pending=not wait)  # Revoke rotates the group key
+    if not wait:
+        return result  # Tx hash (broadcast_tx_async); check outcome on-chain
     if "SuccessValue" in result.status:
-        print(f"Revoked {member_id} from {group_id}, key rotated")
+        logger.info("Revoked {} from {}, key rotated", member_id, group_id)
         return "Revoked"
     raise Exception(f"Revoke failed (check owner auth): {result.status}. Authentication required: Provide your account_id and private_key as the smart contract owner. Or deploy your own contract via `near deploy` and pass `contract_id`.")
 
 @mcp.tool
 async def store_group_key(group_id: str, key: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> str:
     """Stores symmetric key (base64, 32 bytes) for group on NOVA contract (owner only)."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
-    account_id = account_id or os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
-    rpc = os.environ["RPC_URL"]
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
+    rpc = RPC_URL
     key_bytes = base64.b64decode(key)
     if len(key_bytes) != 32:
         raise Exception(f"Invalid key length: {len(key_bytes)} (must be 32 bytes)")
-    near = Account(account_id, private_key, rpc)
-    await near.startup()  # Initialize account for async calls
-    result = await near.function_call(
+    near = await _get_account(account_id, private_key, rpc)
+    result = await _rpc(near.function_call(
         contract_id=contract_id,
         method_name="store_group_key",
         args={"group_id": group_id, "key": key},
-        amount=int("500000000000000000000")  # 0.0005 NEAR yocto
-    )
+        amount=AMOUNT_STORE
+    ))
+    _invalidate_group_keys(group_id, contract_id)
     if "SuccessValue" in result.status:
-        print(f"Key stored for {group_id}: {result.status['SuccessValue']}")
+        logger.info("Key stored for {}: {}", group_id, result.status['SuccessValue'])
         return "Stored"
     raise Exception(f"Store failed (check owner auth): {result.status}. Authentication required: Provide your account_id and private_key as the smart contract owner. Or deploy your own contract via `near deploy` and pass `contract_id`.")
 
 @mcp.tool
 async def get_group_key(group_id: str, user_id: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> str:
     """Retrieves symmetric key (base64, 32 bytes) for authorized user in group. Provide account_id/private_key as member if not using default."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
+    contract_id = _contract_id(contract_id)
     account_id = account_id or user_id  # Use user_id as default account
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
     return await _get_group_key(group_id, user_id, contract_id, private_key)
 
 @mcp.tool
 async def record_near_transaction(group_id: str, user_id: str, file_hash: str, ipfs_hash: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> str:
     """Records file tx on NOVA contract (owner only), returns trans_id. Provide creds as owner if not using default."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
-    account_id = account_id or os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
     return await _record_near_transaction(group_id, user_id, file_hash, ipfs_hash, contract_id, account_id, private_key)
 
 @mcp.tool
 async def composite_upload(group_id: str, user_id: str, data: str, filename: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> dict:
     """Full upload: get_key → encrypt → IPFS pin → record tx (owner for record). Provide creds as owner/member."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
-    account_id = account_id or os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
     try:
-        # Step 1: Fetch key (uses _get_group_key, which has startup)
-        key = await _get_group_key(group_id, user_id, contract_id, private_key)
-        # Step 2: Encrypt data
-        encrypted_b64 = _encrypt_data(data, key)
-        # Step 3: Upload (direct)
-        cid = _ipfs_upload(encrypted_b64, filename)
-        # Step 4: Local hash
-        file_hash = hashlib.sha256(base64.b64decode(data)).hexdigest()
+        # Steps 1+2: Fetch key (uses _get_group_key, which has startup) while decoding + hashing locally in a worker thread.
+        # Always read the current key from chain: encrypting under a just-rotated key would leak to the revoked member.
+        key, (data_bytes, file_hash) = await asyncio.gather(
+            _get_group_key(group_id, user_id, contract_id, private_key, use_cache=False),
+            asyncio.to_thread(_decode_and_hash, data)
+        )
+        # Step 3: Encrypt data (same decoded bytes as the hash; OpenSSL releases the GIL, keep it off the event loop)
+        encrypted = await asyncio.to_thread(_encrypt_bytes, data_bytes, _key_bytes(key))
+        # Step 4: Upload raw ciphertext (no base64 round-trip internally)
+        cid = await _ipfs_upload_bytes(encrypted, filename)
         # Step 5: Blockchain record (uses _record_near_transaction, which needs startup—ensure it's added there if not)
         trans_id = await _record_near_transaction(group_id, user_id, file_hash, cid, contract_id, account_id, private_key)
-        print(f"Composite success: CID={cid}, Trans={trans_id}")
+        logger.debug("Composite success: CID={}, Trans={}", cid, trans_id)
         return {"cid": cid, "trans_id": trans_id, "file_hash": file_hash}
     except Exception as e:
-        raise Exception(f"Composite upload failed: {str(e)}")
+        raise Exception(f"Composite upload failed: {str(e)}") from e
 
 @mcp.tool
 async def composite_retrieve(group_id: str, ipfs_hash: str, account_id: str = None, private_key: str = None, contract_id: str = None) -> dict:
     """Full retrieve: get_key (member) → fetch IPFS → decrypt. Returns {'decrypted_b64': str, 'file_hash': str (for verification)}."""
-    contract_id = contract_id or os.environ["CONTRACT_ID"]
-    account_id = account_id or os.environ.get("SIGNER_ACCOUNT_ID", "nova-sdk-2.testnet")
-    private_key = _validate_near_key(private_key or os.environ.get("NEAR_PRIVATE_KEY", ""))
-    if not ipfs_hash.startswith('Qm'):
-        raise Exception(f"Invalid CID: {ipfs_hash}")
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
+    ipfs_hash = _normalize_cid(ipfs_hash)
+    try:
+        return await _composite_retrieve(group_id, ipfs_hash, account_id, private_key, contract_id)
+    except Exception as e:
+        raise Exception(f"Composite retrieve failed: {str(e)}") from e
+
+@mcp.tool
+async def composite_retrieve_many(group_id: str, cids: list[str], account_id: str = None, private_key: str = None, contract_id: str = None) -> list[dict]:
+    """Full retrieve for several CIDs of one group (at most 16 in flight). Returns [{'cid', 'decrypted_b64', 'file_hash'} or {'cid', 'error'}] in input order."""
+    contract_id = _contract_id(contract_id)
+    account_id = account_id or SIGNER_ACCOUNT_ID
+    private_key = _validate_near_key(private_key or NEAR_PRIVATE_KEY)
+    # One key fetch for the whole batch; an unauthorized caller fails here, before any gateway fetch
     try:
-        # Step 1: Fetch key (member auth)
         key = await _get_group_key(group_id, account_id, contract_id, private_key)
-        # Step 2: Fetch from IPFS (use internal)
-        encrypted_b64 = await _ipfs_retrieve(ipfs_hash)
-        # Step 3: Decrypt (use internal)
-        decrypted_b64 = _decrypt_data(encrypted_b64, key)
-        # Step 4: Hash for verification (user-side compare to on-chain)
-        decrypted_data = base64.b64decode(decrypted_b64)
-        file_hash = hashlib.sha256(decrypted_data).hexdigest()
-        print(f"Composite retrieve success: {len(decrypted_data)} bytes, hash={file_hash}")
-        return {"decrypted_b64": decrypted_b64, "file_hash": file_hash}
     except Exception as e:
-        raise Exception(f"Composite retrieve failed: {str(e)}")
+        raise Exception(f"Composite retrieve failed: {str(e)}") from e
+    sem = asyncio.Semaphore(_RETRIEVE_MANY_LIMIT)
+    async def one(cid: str) -> dict:
+        cid = _normalize_cid(cid)
+        async with sem:
+            return await _decrypt_result(await _ipfs_retrieve_bytes(cid), key)
+    results = await asyncio.gather(*(one(cid) for cid in cids), return_exceptions=True)
+    return [{"cid": cid, "error": str(r)} if isinstance(r, Exception) else {"cid": cid, **r} for cid, r in zip(cids, results)]
 
 @mcp.tool
 async def auth_status(user_id: str, group_id: str = "test_group") -> dict:
     """Tool: Check user auth/groups on NOVA contract. Returns {'authorized': bool, 'groups': list[str], 'member_count': int}."""
-    contract_id = os.environ["CONTRACT_ID"]
-    rpc = os.environ["RPC_URL"]
-    private_key = os.environ.get("NEAR_PRIVATE_KEY", "")  # Dummy for views
+    contract_id = _contract_id()
     try:
-        acc = Account(user_id, private_key, rpc)
-        await acc.startup()
-        # Check authorized
-        auth_result = await acc.view_function(
-            contract_id=contract_id,
-            method_name="is_authorized",
-            args={"group_id": group_id, "user_id": user_id}
+        acc = await _view_account()
+        # Check authorized and list user's groups via transactions concurrently (independent views)
+        auth_result, txs_result = await asyncio.gather(
+            _rpc(acc.view_function(
+                contract_id=contract_id,
+                method_name="is_authorized",
+                args={"group_id": group_id, "user_id": user_id}
+            )),
+            _rpc(acc.view_function(
+                contract_id=contract_id,
+                method_name="get_transactions_for_group",
+                args={"group_id": group_id, "user_id": user_id}  # Reuse for sample; expand to all if multi-view added
+            ))
         )
         authorized = auth_result.result
-        # List user's groups via transactions (filter unique; assume default if none)
-        txs_result = await acc.view_function(
-            contract_id=contract_id,
-            method_name="get_transactions_for_group",
-            args={"group_id": group_id, "user_id": user_id}  # Reuse for sample; expand to all if multi-view added
-        )
+        # Filter unique groups; assume default if none
         groups = list(set(tx["group_id"] for tx in txs_result.result)) if txs_result.result else [group_id]
         member_count = len(groups)
-        print(f"Auth for {user_id} in {group_id}: authorized={authorized}, groups={groups}")
+        logger.debug("Auth for {} in {}: authorized={}, groups={}", user_id, group_id, authorized, groups)
         return {"authorized": authorized, "groups": groups, "member_count": member_count}
     except Exception as e:
         if "Unauthorized" in str(e):
             return {"authorized": False, "groups": [], "member_count": 0}
-        raise Exception(f"Auth query failed: {str(e)}")
+        raise Exception(f"Auth query failed: {str(e)}") from e
 
 if __name__ == "__main__":
-    mcp.run(transport="http", host="127.0.0.1", port=8000)
\ No newline at end of file
+    # uvloop is optional (not available on Windows); fall back to the default asyncio loop
+    try:
+        import uvloop
+    except ImportError:
+        mcp.run(transport="http", host="127.0.0.1", port=8000)
+    else:
+        uvloop.run(mcp.run_async(transport="http", host="127.0.0.1", port=8000))
\ No newline at end of file
@@ -1,17 +1,46 @@
 import asyncio
+import os
+import sys
+import time
 from fastmcp.client import Client
 from fastmcp.client.transports import StreamableHttpTransport
 import base64
 
+# Comma-separated CIDs to fetch concurrently (defaults to your uploaded CID)
+CIDS = [c.strip() for c in os.environ.get("CIDS", "QmWmsL95CYvci8JiortAMhezezr8BhAwAVohVUSJBcZcBL").split(",") if c.strip()]
+GROUP_ID = os.environ.get("GROUP_ID")  # Set to also exercise composite_retrieve_many (needs member creds on the server)
+
+async def timed_pass(client, label):
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(client.call_tool("ipfs_retrieve", {"cid": c}) for c in CIDS), return_exceptions=True)
+    elapsed = time.perf_counter() - t0
+    errors = sum(isinstance(r, Exception) for r in results)
+    print(f"{label}: {len(CIDS)} CIDs in {elapsed:.2f}s ({len(CIDS) / elapsed:.1f} req/s), {errors} failed")
+    return results
+
 async def test_retrieve():
     transport = StreamableHttpTransport("http://127.0.0.1:8000/mcp")
     async with Client(transport) as client:
-        # Use your uploaded CID
-        result = await client.call_tool("ipfs_retrieve", {"cid": "QmWmsL95CYvci8JiortAMhezezr8BhAwAVohVUSJBcZcBL"})
-        print("Raw Result:", result)
-        print("Result Data:", result.data)  # Access .data for str result
-        if result.data:
-            data = base64.b64decode(result.data)
-            print("Decoded:", data.decode('utf-8') if data else "Empty")
+        # Cold pass pays gateway fetches + connection setup; warm pass shows pool reuse and the server's CID cache
+        results = await timed_pass(client, "Cold")
+        if "--cold" not in sys.argv:
+            await timed_pass(client, "Warm")
+        first = results[0]
+        if isinstance(first, Exception):
+            print("First CID failed:", first)
+        elif first.data:  # Access .data for str result
+            data = base64.b64decode(first.data)
+            print("Decoded:", data[:100] if data else "Empty")
+
+        # Batched tools: one call, per-CID results/errors
+        t0 = time.perf_counter()
+        many = await client.call_tool("ipfs_retrieve_many", {"cids": CIDS})
+        failed = [r["cid"] for r in many.structured_content["result"] if "error" in r]
+        print(f"ipfs_retrieve_many: {time.perf_counter() - t0:.2f}s, failed={failed}")
+        if GROUP_ID:
+            t0 = time.perf_counter()
+            many = await client.call_tool("composite_retrieve_many", {"group_id": GROUP_ID, "cids": CIDS})
+            hashes = [r.get("file_hash", r.get("error")) for r in many.structured_content["result"]]
+            print(f"composite_retrieve_many: {time.perf_counter() - t0:.2f}s, hashes={hashes}")
 
-asyncio.run(test_retrieve())
\ No newline at end of file
+asyncio.run(test_retrieve())